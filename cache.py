@@ -0,0 +1,28 @@
+from typing import Optional
+import os
+import tempfile
+import aiofiles
+
+
+def write_atomic(path: str, content: str):
+    """先写入临时文件再替换，避免中断时留下不完整的缓存"""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(content.encode("utf-8"))
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+async def read_cached(path: str) -> Optional[str]:
+    """读取缓存文件，不存在时返回 None（文件也可能被并发的缓存清理删除）"""
+    try:
+        # Binary mode decodes once, skipping text-mode newline translation
+        async with aiofiles.open(path, "rb") as f:
+            return (await f.read()).decode("utf-8")
+    except FileNotFoundError:
+        return None
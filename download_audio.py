@@ -1,35 +1,84 @@
-from bilibili_api import HEADERS, get_client, video
-from typing import BinaryIO
-from io import BytesIO
-
-
-async def download(url: str,  intro: str, file: BinaryIO):
-    dwn_id = await get_client().download_create(url, HEADERS)
-    bts = 0
-    tot = get_client().download_content_length(dwn_id)
-    while True:
-        bts += file.write(await get_client().download_chunk(dwn_id))
-        # print(f"{intro} - [{bts} / {tot}]", end="\r")
-        if bts == tot:
-            break
-    print()
-
-
-async def download_audio(v: video.Video,page) -> BinaryIO:
-    # 创建内存中的二进制文件对象
-    file = BytesIO()
-
-    # 获取视频下载链接
-    download_url_data = await v.get_download_url(page - 1)
-    # 解析视频下载信息
-    detecter = video.VideoDownloadURLDataDetecter(data=download_url_data)
-    streams = detecter.detect_best_streams()
-    # 有 MP4 流 / FLV 流两种可能
-    if not detecter.check_flv_mp4_stream():
-        await download(streams[1].url, "Downloading audio stream", file)
-    else:
-        print("MP4 stream not found")
-
-    # 重置文件指针到开头
-    file.seek(0)
-    return file
+from bilibili_api import HEADERS, video
+import asyncio
+import os
+import aiofiles
+import aiohttp
+
+AUDIO_CACHE_DIR = ".cache/audio"
+CHUNK_SIZE = 1 << 16
+# 长音频的下载时间可能超过会话默认的总超时，只限制单次读取的等待时间
+DOWNLOAD_TIMEOUT = aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=60)
+
+# 按 (bvid, page) 记录进行中和已完成的下载，重试和并发调用共享同一次下载
+_audio_futures: dict[tuple[str, int], asyncio.Task[str]] = {}
+
+
+def _remove_file(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+async def download(url: str, session: aiohttp.ClientSession, path: str):
+    # 分块流式写入临时文件，完成后再改名，避免留下不完整的音频
+    tmp_path = f"{path}.part"
+    try:
+        async with session.get(url, headers=HEADERS, timeout=DOWNLOAD_TIMEOUT) as response:
+            response.raise_for_status()
+            async with aiofiles.open(tmp_path, "wb") as f:
+                async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                    await f.write(chunk)
+        os.replace(tmp_path, path)
+    except BaseException:
+        _remove_file(tmp_path)
+        raise
+
+
+async def fetch_audio(
+    v: video.Video, page: int, session: aiohttp.ClientSession, path: str
+) -> str:
+    # 上次运行已下载完成
+    if os.path.exists(path):
+        return path
+
+    # 获取视频下载链接
+    download_url_data = await v.get_download_url(page - 1)
+    # 解析视频下载信息
+    detecter = video.VideoDownloadURLDataDetecter(data=download_url_data)
+    streams = detecter.detect_best_streams()
+    # 有 MP4 流 / FLV 流两种可能
+    if not detecter.check_flv_mp4_stream():
+        await download(streams[1].url, session, path)
+    else:
+        raise ValueError("MP4 stream not found")
+    return path
+
+
+def _forget_failed(key: tuple[str, int], task: asyncio.Task[str]):
+    # 失败的下载不缓存，下次调用重新下载
+    if task.cancelled() or task.exception() is not None:
+        _audio_futures.pop(key, None)
+
+
+async def download_audio(
+    v: video.Video, page: int, session: aiohttp.ClientSession
+) -> str:
+    """下载音频到磁盘并返回文件路径"""
+    bvid = v.get_bvid()
+    key = (bvid, page)
+    if key not in _audio_futures:
+        os.makedirs(AUDIO_CACHE_DIR, exist_ok=True)
+        path = os.path.join(AUDIO_CACHE_DIR, f"{bvid}_{page}.m4a")
+        task = asyncio.ensure_future(fetch_audio(v, page, session, path))
+        task.add_done_callback(lambda t: _forget_failed(key, t))
+        _audio_futures[key] = task
+    # shield: 一个调用者被取消时不影响共享的下载
+    return await asyncio.shield(_audio_futures[key])
+
+
+async def release_audio(bvid: str, page: int):
+    """字幕生成后删除音频文件"""
+    # _audio_futures 只在事件循环线程上修改，只把删除文件交给线程池
+    _audio_futures.pop((bvid, page), None)
+    await asyncio.to_thread(_remove_file, os.path.join(AUDIO_CACHE_DIR, f"{bvid}_{page}.m4a"))
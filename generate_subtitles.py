@@ -1,51 +1,303 @@
-from typing import Literal, BinaryIO
+import os
+import sys
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterator, Literal, BinaryIO
 from faster_whisper import WhisperModel
+from faster_whisper.audio import decode_audio
 from tqdm import tqdm
 
+# (start, end, text)
+Segment = tuple[float, float, str]
+
+SAMPLING_RATE = 16000
+# The transformers backend decodes fixed 30 s windows, matching Whisper's receptive field
+WINDOW_SECONDS = 30
+TORCHINDUCTOR_CACHE_DIR = ".cache/torchinductor"
+
+# whisper.cpp only publishes q5_1 weights for the smaller models and q5_0 for the larger ones
+WHISPERCPP_QUANT = {
+    "tiny": "q5_1",
+    "base": "q5_1",
+    "small": "q5_1",
+    "medium": "q5_0",
+    "large-v3": "q5_0",
+}
+
 
 def generate_subtitles(
-    audio: BinaryIO,
+    audio: str | BinaryIO,
     type: Literal["text", "timestamped"],
     model_size: str = "small",
     device: str = "cpu",
+    backend: Literal["fasterwhisper", "whispercpp", "transformers"] = "fasterwhisper",
+    beam_size: int = 1,
+    cpu_threads: int = 0,
+    num_workers: int = 1,
 ) -> str:
-    print("Using device:", device)
-    print(f"Loading whisper model: {model_size}")
+    # whisper.cpp always runs on the CPU, whatever device was requested
+    print("Using device:", "cpu" if backend == "whispercpp" else device)
 
-    # Set compute type based on device
-    compute_type = "int8" if "cuda" in device else "float32"
-    model = WhisperModel(model_size, device=device, compute_type=compute_type)
-
-    print("Transcribing...")
-    segments, info = model.transcribe(audio, beam_size=5)
+    if backend == "whispercpp":
+        segments, duration = transcribe_whispercpp(audio, model_size, cpu_threads)
+    elif backend == "transformers":
+        segments, duration = transcribe_transformers(audio, model_size, device, beam_size)
+    else:
+        segments, duration = transcribe_fasterwhisper(
+            audio, model_size, device, beam_size, cpu_threads, num_workers
+        )
 
     results = []
     # Use tqdm for a real-time progress bar
-    with tqdm(total=round(info.duration, 2), desc="Transcribing", unit="s") as pbar:
+    with tqdm(total=round(duration, 2), desc="Transcribing", unit="s") as pbar:
         last_end = 0.0
-        for segment in segments:
-            if type == "text":
-                results.append(segment.text.strip())
-            else:
-                results.append(
-                    f"""{format_timestamp(segment.start)} --> {format_timestamp(segment.end)}
-{segment.text.strip()}
-"""
-                )
+        for start, end, text in segments:
+            results.append(format_segment(start, end, text, type))
             # Update progress bar with the duration of the processed segment
-            pbar.update(round(segment.end - last_end, 2))
-            last_end = segment.end
-        
+            pbar.update(round(end - last_end, 2))
+            last_end = end
+
         # Ensure the progress bar completes fully
-        if last_end < info.duration:
-            pbar.update(round(info.duration - last_end, 2))
+        if last_end < duration:
+            pbar.update(round(duration - last_end, 2))
 
     return "\n".join(results)
 
 
+# Loaded models keyed by (backend, model_size, device, cpu_threads, num_workers),
+# reused across audio files
+_MODEL_CACHE: dict[tuple[str, str, str, int, int], Any] = {}
+
+
+def get_model(
+    backend: Literal["fasterwhisper", "whispercpp", "transformers"],
+    model_size: str,
+    device: str,
+    cpu_threads: int = 0,
+    num_workers: int = 1,
+) -> Any:
+    """返回已缓存的模型，首次使用时加载。cpu_threads 为 0 时使用后端默认值"""
+    key = (backend, model_size, device, cpu_threads, num_workers)
+    if key not in _MODEL_CACHE:
+        print(f"Loading whisper model: {model_size} ({backend})")
+        if backend == "whispercpp":
+            _MODEL_CACHE[key] = load_whispercpp_model(model_size, cpu_threads)
+        elif backend == "transformers":
+            _MODEL_CACHE[key] = load_transformers_model(model_size, device)
+        else:
+            _MODEL_CACHE[key] = load_fasterwhisper_model(
+                model_size, device, cpu_threads, num_workers
+            )
+    return _MODEL_CACHE[key]
+
+
+def preload_model(
+    backend: Literal["fasterwhisper", "whispercpp", "transformers"],
+    model_size: str,
+    device: str,
+    cpu_threads: int = 0,
+    num_workers: int = 1,
+):
+    """提前加载 generate_subtitles 会用到的模型（与其缓存键一致）"""
+    if backend == "whispercpp":
+        get_model("whispercpp", model_size, "cpu", cpu_threads)
+    elif backend == "transformers":
+        get_model("transformers", model_size, device)
+    else:
+        get_model("fasterwhisper", model_size, device, cpu_threads, num_workers)
+
+
+def release_models():
+    """释放所有已缓存的模型（及其占用的显存）"""
+    _MODEL_CACHE.clear()
+    if "torch" in sys.modules:
+        import torch
+
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+
+def load_fasterwhisper_model(
+    model_size: str, device: str, cpu_threads: int = 0, num_workers: int = 1
+) -> WhisperModel:
+    # int8 weights on both devices: negligible accuracy loss and much faster than float32
+    compute_type = "int8_float16" if "cuda" in device else "int8"
+    # num_workers > 1 lets several transcribe() calls run in parallel on one model
+    return WhisperModel(
+        model_size,
+        device=device,
+        compute_type=compute_type,
+        cpu_threads=cpu_threads,
+        num_workers=num_workers,
+    )
+
+
+def load_whispercpp_model(model_size: str, cpu_threads: int = 0):
+    from pywhispercpp.model import Model
+
+    return Model(
+        f"{model_size}-{WHISPERCPP_QUANT[model_size]}",
+        n_threads=cpu_threads or os.cpu_count(),
+    )
+
+
+def transcribe_fasterwhisper(
+    audio: str | BinaryIO,
+    model_size: str,
+    device: str,
+    beam_size: int = 1,
+    cpu_threads: int = 0,
+    num_workers: int = 1,
+) -> tuple[Iterator[Segment], float]:
+    model = get_model("fasterwhisper", model_size, device, cpu_threads, num_workers)
+
+    print("Transcribing...")
+    segments, info = model.transcribe(
+        audio,
+        # Greedy decoding by default; the summarizer tolerates minor transcription noise
+        beam_size=beam_size,
+        best_of=1,
+        temperature=0.0,
+        # Skip silent spans instead of running the encoder over them
+        vad_filter=True,
+        vad_parameters=dict(min_silence_duration_ms=500),
+        # Avoids hallucination loops that force the decoder to re-run
+        condition_on_previous_text=False,
+    )
+    return ((s.start, s.end, s.text) for s in segments), info.duration
+
+
+def transcribe_whispercpp(
+    audio: str | BinaryIO, model_size: str, cpu_threads: int = 0
+) -> tuple[Iterator[Segment], float]:
+    """使用 whisper.cpp 的量化 GGML 模型转录（仅 CPU，贪心解码）"""
+    model = get_model("whispercpp", model_size, "cpu", cpu_threads)
+    samples = decode_audio(audio, sampling_rate=SAMPLING_RATE)
+
+    print("Transcribing...")
+    segments = model.transcribe(samples)
+    # whisper.cpp timestamps are in units of 10 ms
+    return (
+        ((s.t0 / 100, s.t1 / 100, s.text) for s in segments),
+        len(samples) / SAMPLING_RATE,
+    )
+
+
+def load_transformers_model(
+    model_size: str, device: str
+) -> Callable[[list[np.ndarray], int], list[str]]:
+    """加载并编译 HF transformers Whisper，返回批量转录 30 秒窗口的函数"""
+    # Must be set before torch compiles anything so inductor artifacts survive between runs
+    os.environ.setdefault("TORCHINDUCTOR_CACHE_DIR", os.path.abspath(TORCHINDUCTOR_CACHE_DIR))
+    import torch
+    from transformers import WhisperForConditionalGeneration, WhisperProcessor
+
+    model_id = f"openai/whisper-{model_size}"
+    dtype = torch.float16 if "cuda" in device else torch.float32
+    processor = WhisperProcessor.from_pretrained(model_id)
+    model = WhisperForConditionalGeneration.from_pretrained(
+        model_id, torch_dtype=dtype, attn_implementation="sdpa"
+    ).to(device)
+    # A static KV cache keeps tensor shapes fixed so the decoder can be captured as CUDA graphs
+    model.generation_config.cache_implementation = "static"
+    model.forward = torch.compile(model.forward, mode="reduce-overhead", fullgraph=True)
+
+    def generate(windows: list[np.ndarray], beam_size: int) -> list[str]:
+        features = processor(
+            windows, sampling_rate=SAMPLING_RATE, return_tensors="pt"
+        ).input_features.to(device, dtype)
+        with torch.inference_mode():
+            ids = model.generate(features, num_beams=beam_size)
+        return processor.batch_decode(ids, skip_special_tokens=True)
+
+    # Warm up so the one-time compilation cost is not attributed to the first window
+    print("Compiling model...")
+    generate([np.zeros(SAMPLING_RATE, dtype=np.float32)], 1)
+    return generate
+
+
+def split_windows(samples: np.ndarray) -> Iterator[tuple[float, float, np.ndarray]]:
+    """将音频切分为 30 秒窗口，返回 (start, end, samples)"""
+    duration = len(samples) / SAMPLING_RATE
+    window_size = WINDOW_SECONDS * SAMPLING_RATE
+    for offset in range(0, len(samples), window_size):
+        start = offset / SAMPLING_RATE
+        yield start, min(start + WINDOW_SECONDS, duration), samples[offset : offset + window_size]
+
+
+def transcribe_transformers(
+    audio: str | BinaryIO, model_size: str, device: str, beam_size: int = 1
+) -> tuple[Iterator[Segment], float]:
+    """使用 torch.compile 编译的 HF transformers Whisper 转录（适用于 GPU）"""
+    generate = get_model("transformers", model_size, device)
+    samples = decode_audio(audio, sampling_rate=SAMPLING_RATE)
+
+    print("Transcribing...")
+    return (
+        (start, end, generate([window], beam_size)[0])
+        for start, end, window in split_windows(samples)
+    ), len(samples) / SAMPLING_RATE
+
+
+def transcribe_batch(
+    audios: list[str | BinaryIO],
+    type: Literal["text", "timestamped"],
+    model_size: str = "small",
+    device: str = "cpu",
+    backend: Literal["fasterwhisper", "whispercpp", "transformers"] = "fasterwhisper",
+    beam_size: int = 1,
+    cpu_threads: int = 0,
+    num_workers: int = 1,
+    batch_size: int = 8,
+) -> list[str]:
+    """转录多个音频。transformers 后端会把所有音频的 30 秒窗口合并成批次一起推理，
+    faster-whisper 用 num_workers 个线程并行转录，whisper.cpp 逐个转录。"""
+    def transcribe_one(audio: str | BinaryIO) -> str:
+        return generate_subtitles(
+            audio, type, model_size, device, backend, beam_size, cpu_threads, num_workers
+        )
+
+    if backend == "fasterwhisper" and num_workers > 1 and len(audios) > 1:
+        # CTranslate2 releases the GIL, so the model's workers run these truly in parallel
+        with ThreadPoolExecutor(max_workers=num_workers) as pool:
+            return list(pool.map(transcribe_one, audios))
+    if backend != "transformers" or len(audios) == 1:
+        return [transcribe_one(audio) for audio in audios]
+
+    print("Using device:", device)
+    generate = get_model("transformers", model_size, device)
+
+    # Flatten every audio into (audio index, start, end, window) so batches can span pages
+    windows = [
+        (i, start, end, window)
+        for i, audio in enumerate(audios)
+        for start, end, window in split_windows(decode_audio(audio, sampling_rate=SAMPLING_RATE))
+    ]
+    results: list[list[str]] = [[] for _ in audios]
+    for offset in tqdm(range(0, len(windows), batch_size), desc="Transcribing batches"):
+        batch = windows[offset : offset + batch_size]
+        texts = generate([window for _, _, _, window in batch], beam_size)
+        for (i, start, end, _), text in zip(batch, texts):
+            results[i].append(format_segment(start, end, text, type))
+
+    return ["\n".join(r) for r in results]
+
+
+def format_segment(
+    start: float, end: float, text: str, type: Literal["text", "timestamped"]
+) -> str:
+    if type == "text":
+        return text.strip()
+    return f"""{format_timestamp(start)} --> {format_timestamp(end)}
+{text.strip()}
+"""
+
+
 def format_timestamp(seconds: float) -> str:
     """将秒转换为 SRT 时间格式"""
-    hours = int(seconds // 3600)
-    minutes = int((seconds % 3600) // 60)
-    seconds = seconds % 60
-    return f"{hours:02d}:{minutes:02d}:{seconds:06.3f}".replace(".", ",")
\ No newline at end of file
+    # Integer milliseconds avoid the float formatting + "." -> "," replace, and rounding can no
+    # longer print a seconds field of 60,000 (e.g. 00:21:60,000)
+    ms = round(seconds * 1000)
+    minutes, ms = divmod(ms, 60_000)
+    hours, minutes = divmod(minutes, 60)
+    return "%02d:%02d:%02d,%03d" % (hours, minutes, ms // 1000, ms % 1000)
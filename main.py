@@ -1,19 +1,33 @@
 from bilibili_api import Credential, video, channel_series
 import asyncio
 import aiohttp
+import aiofiles
+import ijson
 import os
 import argparse
 import logging
 import time
+import re
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from tqdm.asyncio import tqdm
 
-from generate_subtitles import generate_subtitles
+from generate_subtitles import transcribe_batch, preload_model, release_models
 
 # --- Cache Configuration ---
 CACHE_DIR = ".cache/subtitles"
 CACHE_MAX_AGE_DAYS = 30
 # --- End Cache Configuration ---
 
+# Subtitles with fewer distinct lines than this fraction are treated as Whisper hallucinations
+MIN_UNIQUE_LINE_RATIO = 0.3
+
+# Whisper runs off the event loop on one dedicated thread: CTranslate2 releases the GIL while
+# decoding, and CUDA graphs captured by torch.compile may only be replayed from the same thread.
+WHISPER_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="whisper")
+
 def cleanup_cache(directory: str, max_age_days: int):
     """Deletes files in a directory older than max_age_days."""
     if not os.path.exists(directory):
@@ -23,35 +37,56 @@ def cleanup_cache(directory: str, max_age_days: int):
     cutoff_time = time.time() - (max_age_days * 24 * 60 * 60)
     
     cleaned_count = 0
-    for filename in os.listdir(directory):
-        file_path = os.path.join(directory, filename)
-        if os.path.isfile(file_path):
+    # DirEntry caches the file type and stat result, avoiding extra syscalls per file
+    with os.scandir(directory) as it:
+        for entry in it:
             try:
-                if os.path.getmtime(file_path) < cutoff_time:
-                    os.remove(file_path)
+                if entry.is_file() and entry.stat().st_mtime < cutoff_time:
+                    os.remove(entry.path)
                     cleaned_count += 1
             except OSError as e:
-                logging.error(f"Error removing cache file {file_path}: {e}")
+                logging.error(f"Error removing cache file {entry.path}: {e}")
     if cleaned_count > 0:
         logging.info(f"Removed {cleaned_count} outdated cache file(s).")
     else:
         logging.info("No outdated cache files to remove.")
-from download_audio import download_audio
-from summarize import summarize
+from download_audio import download_audio, release_audio, AUDIO_CACHE_DIR
+from summarize import summarize, SUMMARY_CACHE_DIR
+from cache import read_cached
 from read_prompt import read_prompt
 from dotenv import load_dotenv
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def save(page_number: int, filename: str, content: str, output_dir: str):
-    """Saves content to a file in the specified directory with a sanitized filename."""
-    # Sanitize filename to remove characters invalid for file paths
-    safe_filename = "".join(c for c in filename if c.isalnum() or c in (' ', '.', '_', '-')).rstrip()
-    
-    os.makedirs(output_dir, exist_ok=True)
+# Everything except alphanumerics (as in str.isalnum) and ' ', '.', '_', '-'
+INVALID_FILENAME_CHARS = re.compile(r"[^\w .-]")
+
+def output_filename(page_number: int, title: str) -> str:
+    """Builds the summary file name for a page from its title."""
+    # Sanitize title to remove characters invalid for file paths
+    safe_title = INVALID_FILENAME_CHARS.sub("", title).rstrip()
     # Format page number with leading zeros for consistent sorting
-    file_path = os.path.join(output_dir, f"P{page_number:03d}_{safe_filename}.md")
+    return f"P{page_number:03d}_{safe_title}.md"
+
+def list_existing_outputs(output_dir: str) -> set[str]:
+    """Returns the names of the files already present in the output directory."""
+    if not os.path.isdir(output_dir):
+        return set()
+    with os.scandir(output_dir) as it:
+        return {entry.name for entry in it}
+
+def positive_int(value: str) -> int:
+    """argparse type for options that must be at least 1."""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be a positive integer, got {value}")
+    return number
+
+def save(filename: str, content: str, output_dir: str):
+    """Saves content to a file in the specified directory."""
+    os.makedirs(output_dir, exist_ok=True)
+    file_path = os.path.join(output_dir, filename)
     
     with open(file_path, "w", encoding="utf-8") as f:
         f.write(content)
@@ -59,83 +94,262 @@ def save(page_number: int, filename: str, content: str, output_dir: str):
     logging.info(f"Successfully saved: {file_path}")
     return file_path
 
-async def get_subtitle(v: video.Video, page_number: int, device: str, model_size: str, bvid: str):
-    """Gets subtitles for a specific page, using a cache to avoid re-generation."""
-    cache_key = f"{bvid}_{page_number}"
-    cache_file_path = os.path.join(CACHE_DIR, f"{cache_key}.txt")
+def whisper_options(args: argparse.Namespace) -> dict:
+    """Collects the CLI options that are forwarded to generate_subtitles."""
+    # Only faster-whisper can run several transcriptions on one model, and only batches have
+    # more than one audio to run in parallel
+    parallel = args.whisper_backend == "fasterwhisper" and args.batch_size > 1
+    num_workers = args.whisper_workers if parallel else 1
+    return {
+        "device": args.device,
+        "model_size": args.model_size,
+        "backend": args.whisper_backend,
+        "beam_size": args.beam_size,
+        # Split the cores between workers unless set explicitly
+        "cpu_threads": args.whisper_threads or max(1, (os.cpu_count() or 4) // num_workers),
+        "num_workers": num_workers,
+    }
+
+@dataclass
+class PageJob:
+    """A video page scheduled for processing."""
+    v: video.Video
+    page: dict
+    filename: str
+    bvid: str
+    # Page number used in the output file name (global counter for seasons)
+    number: int
+
+    @property
+    def page_number(self) -> int:
+        return self.page['page']
+
+    @property
+    def title(self) -> str:
+        return self.page['part']
+
+def subtitle_cache_path(bvid: str, page_number: int) -> str:
+    return os.path.join(CACHE_DIR, f"{bvid}_{page_number}.txt")
+
+async def fetch_subtitle_source(v: video.Video, page_number: int, bvid: str, session: aiohttp.ClientSession, on_audio_needed: Callable[[], None]) -> tuple[str | None, str | None]:
+    """Gets the subtitle text of a page from the cache or official subtitles, or downloads its audio.
+
+    Returns (subtitle_text, None) when text is available and (None, audio_path) when the
+    audio still has to be transcribed. `on_audio_needed` is called before the download starts.
+    """
+    cache_file_path = subtitle_cache_path(bvid, page_number)
 
     # 1. Check cache first
-    if os.path.exists(cache_file_path):
+    if (cached := await read_cached(cache_file_path)) is not None:
         logging.info(f"Loading subtitles for P{page_number} from cache.")
-        with open(cache_file_path, "r", encoding="utf-8") as f:
-            return f.read()
+        return cached, None
 
-    # 2. If not in cache, fetch or generate
+    # 2. If not in cache, fetch official subtitles or download the audio
     logging.info(f"No cache found for P{page_number}. Fetching or generating subtitles.")
     cid = await v.get_cid(page_number - 1)
     subtitle_data = await v.get_subtitle(cid)
-    
-    subtitle_text = None
-    
-    # Try to get official subtitles
+
     if subtitle_data and subtitle_data.get("subtitles"):
         logging.info(f"Found official subtitles for P{page_number}.")
         url = f"https:{subtitle_data['subtitles'][0]['subtitle_url']}"
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as response:
-                response.raise_for_status()
-                j = await response.json()
-                subtitle_text = "\n".join([item["content"] for item in j["body"]])
-    else:
-        # Generate subtitles if none are found
-        logging.info(f"No official subtitles found for P{page_number}. Generating from audio...")
-        audio_file = await download_audio(v, page_number)
-        subtitle_text = generate_subtitles(audio_file, "text", device=device, model_size=model_size)
+        async with session.get(url) as response:
+            response.raise_for_status()
+            # Stream only the body[].content strings instead of buffering and parsing the whole JSON
+            subtitle_text = "\n".join([content async for content in ijson.items_async(response.content, "body.item.content")])
+        await cache_subtitle(bvid, page_number, subtitle_text)
+        return subtitle_text, None
+
+    logging.info(f"No official subtitles found for P{page_number}. Downloading audio...")
+    on_audio_needed()
+    return None, await download_audio(v, page_number, session)
 
-    # 3. Save to cache if content was successfully obtained
+async def cache_subtitle(bvid: str, page_number: int, subtitle_text: str):
+    """Saves subtitles to the cache if content was successfully obtained."""
     if subtitle_text and subtitle_text.strip():
         logging.info(f"Saving subtitles for P{page_number} to cache.")
-        with open(cache_file_path, "w", encoding="utf-8") as f:
-            f.write(subtitle_text)
-            
-    return subtitle_text
-
-async def process_page(v: video.Video, page_details: dict, prompt_text: str, bvid: str, args: argparse.Namespace, save_page_number: int = None):
-    """Processes a single video page, including retries."""
-    page_number = page_details['page']
-    title = page_details['part']
-    max_retries = 3
-    
-    _save_page_number = save_page_number if save_page_number is not None else page_number
-    
-    for attempt in range(max_retries):
-        try:
-            logging.info(f"Processing P{_save_page_number}: {title}")
-            
-            subtitle_text = await get_subtitle(v, page_number, device=args.device, model_size=args.model_size, bvid=bvid)
-            if not subtitle_text or not subtitle_text.strip():
-                logging.warning(f"Subtitle for P{_save_page_number} is empty. Skipping summary.")
-                return
-
-            summary = await summarize(subtitle_text, prompt_text)
-            if summary:
-                save(_save_page_number, title, summary, args.output_dir)
-            else:
-                logging.error(f"Failed to generate summary for P{_save_page_number}.")
+        async with aiofiles.open(subtitle_cache_path(bvid, page_number), "wb") as f:
+            await f.write(subtitle_text.encode("utf-8"))
 
-            return  # Success, exit retry loop
+def is_trivial_subtitle(subtitle_text: str, min_chars: int) -> bool:
+    """Whether a subtitle is too short or too repetitive to be worth an LLM call."""
+    if len(subtitle_text.strip()) < min_chars:
+        return True
+    # Whisper hallucinating on music or silence repeats the same line over and over
+    lines = subtitle_text.splitlines()
+    return len(set(lines)) / max(1, len(lines)) < MIN_UNIQUE_LINE_RATIO
 
+async def with_retries(label: str, func, *args, max_retries: int = 3):
+    """Awaits func(*args), retrying network errors with backoff.
+
+    Failures are logged here and re-raised so the caller can skip the page.
+    """
+    for attempt in range(max_retries):
+        try:
+            return await func(*args)
         except (aiohttp.ClientError, asyncio.TimeoutError) as e:
-            logging.warning(f"Network error on P{_save_page_number}, attempt {attempt + 1}/{max_retries}: {e}")
+            logging.warning(f"Network error on {label}, attempt {attempt + 1}/{max_retries}: {e}")
             if attempt + 1 == max_retries:
-                logging.error(f"P{_save_page_number} failed after {max_retries} retries. Skipping.")
+                logging.error(f"{label} failed after {max_retries} retries. Skipping.")
+                raise
+            await asyncio.sleep(5 * (attempt + 1))  # Exponential backoff
+        except Exception as e:
+            logging.error(f"An unexpected error occurred while processing {label}: {e}", exc_info=True)
+            raise  # Do not retry on unknown errors
+
+async def run_pipeline(jobs: AsyncIterator[PageJob], prompt_text: str, session: aiohttp.ClientSession, args: argparse.Namespace, pbar: tqdm, existing_files: set[str]):
+    """Processes pages in three overlapping stages: download -> transcribe -> summarize.
+
+    The stages are connected by bounded queues, so the next page is already downloading
+    while the current one is transcribed and the previous one is summarized. Jobs are
+    consumed as `jobs` yields them, so processing starts before every page is listed.
+    `existing_files` is updated as summaries are saved.
+    """
+    job_queue: asyncio.Queue[PageJob | None] = asyncio.Queue(maxsize=args.concurrency)
+    # Large enough to hold a full transcription batch
+    audio_queue: asyncio.Queue[tuple[PageJob, str] | None] = asyncio.Queue(maxsize=max(2, args.batch_size))
+    summary_queue: asyncio.Queue[tuple[PageJob, str] | None] = asyncio.Queue(maxsize=2)
+    options = whisper_options(args)
+    model_warmup: asyncio.Future | None = None
+
+    def start_model_warmup():
+        # Load the Whisper model on its thread while the first page that needs transcription
+        # downloads; transcriptions queue behind it and find the model cached
+        nonlocal model_warmup
+        if model_warmup is None:
+            model_warmup = asyncio.get_running_loop().run_in_executor(
+                WHISPER_EXECUTOR,
+                partial(preload_model, options["backend"], options["model_size"], options["device"], options["cpu_threads"], options["num_workers"]),
+            )
+
+    async def producer():
+        async for job in jobs:
+            await job_queue.put(job)
+        for _ in range(args.concurrency):
+            await job_queue.put(None)
+
+    async def downloader():
+        while (job := await job_queue.get()) is not None:
+            # Checkpoint: another worker may have produced this file in the meantime
+            if job.filename in existing_files:
+                logging.info(f"Skipping P{job.number} '{job.title}' as it already exists.")
+                pbar.update(1)
+                continue
+            logging.info(f"Processing P{job.number}: {job.title}")
+            try:
+                subtitle_text, audio = await with_retries(f"P{job.number}", fetch_subtitle_source, job.v, job.page_number, job.bvid, session, start_model_warmup)
+            except Exception:
+                pbar.update(1)  # Already logged by with_retries
+                continue
+            if audio is not None:
+                await audio_queue.put((job, audio))
             else:
-                await asyncio.sleep(5 * (attempt + 1))  # Exponential backoff
+                await summary_queue.put((job, subtitle_text))
+
+    async def transcribe(audios: list[str]) -> list[str]:
+        return await asyncio.get_running_loop().run_in_executor(
+            WHISPER_EXECUTOR,
+            partial(transcribe_batch, audios, "text", batch_size=args.batch_size, **options),
+        )
+
+    async def transcriber():
+        while (item := await audio_queue.get()) is not None:
+            # Whatever else has been downloaded meanwhile joins the batch
+            batch = [item]
+            while len(batch) < args.batch_size and not audio_queue.empty():
+                if (item := audio_queue.get_nowait()) is None:
+                    audio_queue.put_nowait(None)
+                    break
+                batch.append(item)
+
+            logging.info(f"Transcribing a batch of {len(batch)} audio file(s).")
+            try:
+                transcribed = list(zip(batch, await transcribe([audio for _, audio in batch])))
+            except Exception as e:
+                if len(batch) > 1:
+                    logging.warning(f"Failed to transcribe the batch, retrying its pages one at a time: {e}")
+                    transcribed = None
+                else:
+                    job, _ = batch[0]
+                    logging.error(f"Failed to transcribe P{job.number}: {e}", exc_info=True)
+                    pbar.update(1)
+                    continue
+
+            if transcribed is None:
+                # One bad audio should not cost the rest of the batch, so find it page by page
+                transcribed = []
+                for job, audio in batch:
+                    try:
+                        transcribed.append(((job, audio), (await transcribe([audio]))[0]))
+                    except Exception as e:
+                        logging.error(f"Failed to transcribe P{job.number}: {e}", exc_info=True)
+                        pbar.update(1)
+
+            for (job, _), subtitle_text in transcribed:
+                try:
+                    await cache_subtitle(job.bvid, job.page_number, subtitle_text)
+                    if subtitle_text and subtitle_text.strip():
+                        # The cached subtitles replace the audio from now on
+                        await release_audio(job.bvid, job.page_number)
+                except Exception as e:
+                    logging.error(f"An unexpected error occurred while processing P{job.number}: {e}", exc_info=True)
+                    pbar.update(1)
+                    continue
+                await summary_queue.put((job, subtitle_text))
+
+    async def summarizer():
+        while (item := await summary_queue.get()) is not None:
+            job, subtitle_text = item
+            try:
+                if not subtitle_text or not subtitle_text.strip():
+                    logging.warning(f"Subtitle for P{job.number} is empty. Skipping summary.")
+                    continue
+
+                if is_trivial_subtitle(subtitle_text, args.min_summary_chars):
+                    logging.info(f"Subtitle for P{job.number} is too short or repetitive to summarize. Saving it as is.")
+                    await asyncio.to_thread(save, job.filename, subtitle_text, args.output_dir)
+                    existing_files.add(job.filename)
+                    continue
+
+                try:
+                    summary = await with_retries(f"P{job.number}", summarize, subtitle_text, prompt_text, args.summary_model, args.reasoning_effort)
+                except Exception:
+                    continue  # Already logged by with_retries
+                if summary:
+                    await asyncio.to_thread(save, job.filename, summary, args.output_dir)
+                    existing_files.add(job.filename)
+                else:
+                    logging.error(f"Failed to generate summary for P{job.number}.")
+            except Exception as e:
+                logging.error(f"An unexpected error occurred while processing P{job.number}: {e}", exc_info=True)
+            finally:
+                pbar.update(1)
+
+    async def download_stage():
+        async with asyncio.TaskGroup() as tg:
+            tg.create_task(producer())
+            for _ in range(args.concurrency):
+                tg.create_task(downloader())
+        await audio_queue.put(None)
+
+    async def transcribe_stage():
+        await transcriber()
+        # Transcription only ends after every download, so nothing else feeds the summarizers now
+        for _ in range(args.concurrency):
+            await summary_queue.put(None)
+
+    async with asyncio.TaskGroup() as tg:
+        tg.create_task(download_stage())
+        tg.create_task(transcribe_stage())
+        for _ in range(args.concurrency):
+            tg.create_task(summarizer())
+
+    if model_warmup is not None:
+        try:
+            await model_warmup
         except Exception as e:
-            logging.error(f"An unexpected error occurred while processing P{_save_page_number}: {e}", exc_info=True)
-            break  # Do not retry on unknown errors
+            logging.warning(f"Failed to preload the Whisper model: {e}")
 
-async def process_bvid(args, credential):
+async def process_bvid(args, credential, session: aiohttp.ClientSession):
     """Processes a single Bilibili video, identified by its BVID."""
     v = video.Video(bvid=args.bvid, credential=credential)
     prompt_text = read_prompt(args.prompt)
@@ -152,22 +366,28 @@ async def process_bvid(args, credential):
         if p['page'] >= args.start_page and (args.end_page is None or p['page'] <= args.end_page)
     ]
 
-    for page in tqdm(pages_to_process, desc=f"Processing Pages for {args.bvid}"):
-        title = page['part']
-        page_number = page['page']
-        
-        # Sanitize filename for checking existence
-        safe_filename = "".join(c for c in title if c.isalnum() or c in (' ', '.', '_', '-')).rstrip()
-        output_path = os.path.join(args.output_dir, f"P{page_number:03d}_{safe_filename}.md")
-
-        # Checkpoint: Skip if file already exists
-        if os.path.exists(output_path):
-            logging.info(f"Skipping P{page_number} '{title}' as it already exists.")
-            continue
-            
-        await process_page(v, page, prompt_text, bvid=args.bvid, args=args)
-
-async def process_season(args, credential):
+    existing_files = list_existing_outputs(args.output_dir)
+    pbar = tqdm(total=len(pages_to_process), desc=f"Processing Pages for {args.bvid}")
+
+    async def page_jobs():
+        for page in pages_to_process:
+            title = page['part']
+            page_number = page['page']
+
+            filename = output_filename(page_number, title)
+
+            # Checkpoint: Skip if file already exists
+            if filename in existing_files:
+                logging.info(f"Skipping P{page_number} '{title}' as it already exists.")
+                pbar.update(1)
+                continue
+
+            yield PageJob(v, page, filename, args.bvid, page_number)
+
+    await run_pipeline(page_jobs(), prompt_text, session, args, pbar, existing_files)
+    pbar.close()
+
+async def process_season(args, credential, session: aiohttp.ClientSession):
     """Processes all videos in a Bilibili channel series (season)."""
     series = channel_series.ChannelSeries(
         id_=args.season_id,
@@ -178,36 +398,44 @@ async def process_season(args, credential):
     
     logging.info(f"Found {len(video_list['archives'])} videos in season {args.season_id}.")
 
-    global_page_counter = 1
-    for video_info in tqdm(video_list["archives"], desc=f"Processing Season {args.season_id}"):
-        bvid = video_info["bvid"]
-        
-        v = video.Video(bvid=bvid, credential=credential)
-        prompt_text = read_prompt(args.prompt)
-        
-        try:
-            all_pages = await v.get_pages()
-        except Exception as e:
-            logging.error(f"Failed to retrieve pages for {bvid}. Skipping video. Error: {e}")
-            continue
+    prompt_text = read_prompt(args.prompt)
+    existing_files = list_existing_outputs(args.output_dir)
+    pbar = tqdm(total=0, desc=f"Processing Season {args.season_id}")
 
-        # Note: We are not using args.start_page or args.end_page for seasons,
-        # we process all pages of all videos.
-        for page in all_pages:
-            title = page['part']
-            
-            # Sanitize filename for checking existence
-            safe_filename = "".join(c for c in title if c.isalnum() or c in (' ', '.', '_', '-')).rstrip()
-            output_path = os.path.join(args.output_dir, f"P{global_page_counter:03d}_{safe_filename}.md")
+    # Pages are listed video by video while earlier pages are already being processed
+    async def page_jobs():
+        global_page_counter = 1
+        for video_info in video_list["archives"]:
+            bvid = video_info["bvid"]
 
-            # Checkpoint: Skip if file already exists
-            if os.path.exists(output_path):
-                logging.info(f"Skipping P{global_page_counter} '{title}' as it already exists.")
-                global_page_counter += 1
+            v = video.Video(bvid=bvid, credential=credential)
+
+            try:
+                all_pages = await v.get_pages()
+            except Exception as e:
+                logging.error(f"Failed to retrieve pages for {bvid}. Skipping video. Error: {e}")
                 continue
-            
-            await process_page(v, page, prompt_text, bvid=bvid, args=args, save_page_number=global_page_counter)
-            global_page_counter += 1
+
+            pbar.total += len(all_pages)
+            pbar.refresh()
+
+            # Note: We are not using args.start_page or args.end_page for seasons,
+            # we process all pages of all videos.
+            for page in all_pages:
+                title = page['part']
+
+                filename = output_filename(global_page_counter, title)
+
+                # Checkpoint: Skip if file already exists
+                if filename in existing_files:
+                    logging.info(f"Skipping P{global_page_counter} '{title}' as it already exists.")
+                    pbar.update(1)
+                else:
+                    yield PageJob(v, page, filename, bvid, global_page_counter)
+                global_page_counter += 1
+
+    await run_pipeline(page_jobs(), prompt_text, session, args, pbar, existing_files)
+    pbar.close()
 
 async def main():
     parser = argparse.ArgumentParser(description="Bilibili Video Summarizer")
@@ -221,11 +449,22 @@ async def main():
     parser.add_argument("--output-dir", type=str, default="result", help="The directory to save the summary files.")
     parser.add_argument("--device", type=str, default="cuda", choices=["cuda", "cpu"], help="Device to use for subtitle generation (cuda or cpu).")
     parser.add_argument("--model-size", type=str, default="small", choices=["tiny", "base", "small", "medium", "large-v3"], help="Whisper model size to use for subtitle generation.")
+    parser.add_argument("--whisper-backend", type=str, default="fasterwhisper", choices=["fasterwhisper", "whispercpp", "transformers"], help="Whisper implementation to use (whispercpp runs quantized GGML models on CPU, transformers runs a torch.compile'd model on GPU).")
+    parser.add_argument("--summary-model", type=str, default=None, help="LiteLLM model used for summaries (default: routed by subtitle length between gemini-2.5-flash-lite and gemini-2.5-flash).")
+    parser.add_argument("--reasoning-effort", type=str, default=None, choices=["low", "medium", "high"], help="Reasoning effort for summaries (default: low for short subtitles, high otherwise).")
+    parser.add_argument("--min-summary-chars", type=int, default=200, help="Subtitles shorter than this are saved as is instead of being summarized.")
+    parser.add_argument("--beam-size", type=int, default=1, help="Beam size for faster-whisper decoding (1 = greedy, use 5 for archival-quality subtitles).")
+    parser.add_argument("--whisper-threads", type=positive_int, default=None, help="CPU threads per Whisper worker (default: all CPU cores, divided by --whisper-workers when --batch-size > 1).")
+    parser.add_argument("--whisper-workers", type=positive_int, default=2, help="Number of faster-whisper workers transcribing in parallel (effective with --batch-size > 1).")
+    parser.add_argument("--batch-size", type=positive_int, default=1, help="Number of pages whose audio is transcribed together (batches 30 s windows across pages with the transformers backend).")
+    parser.add_argument("--concurrency", type=positive_int, default=4, help="Number of pages downloaded and summarized concurrently.")
     args = parser.parse_args()
 
-    # Create cache directory and clean up old files
-    os.makedirs(CACHE_DIR, exist_ok=True)
-    cleanup_cache(CACHE_DIR, CACHE_MAX_AGE_DAYS)
+    # Create cache directories and clean up old files in the background
+    cleanup_tasks = []
+    for cache_dir in (CACHE_DIR, SUMMARY_CACHE_DIR, AUDIO_CACHE_DIR):
+        os.makedirs(cache_dir, exist_ok=True)
+        cleanup_tasks.append(asyncio.create_task(asyncio.to_thread(cleanup_cache, cache_dir, CACHE_MAX_AGE_DAYS)))
 
     # Load credentials from .env file
     load_dotenv()
@@ -237,11 +476,18 @@ async def main():
     if not c.sessdata:
         logging.warning("Credential SESSDATA not found. Operations may be limited. Please create a .env file.")
 
+    # One shared session so all subtitle fetches reuse pooled keep-alive connections
+    connector = aiohttp.TCPConnector(limit=32, ttl_dns_cache=300)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        if args.season_id:
+            await process_season(args, c, session)
+        else:
+            await process_bvid(args, c, session)
 
-    if args.season_id:
-        await process_season(args, c)
-    else:
-        await process_bvid(args, c)
+    await asyncio.gather(*cleanup_tasks)
+
+    # Free Whisper weights (and GPU memory) on the thread that used them
+    await asyncio.get_running_loop().run_in_executor(WHISPER_EXECUTOR, release_models)
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -1,32 +1,88 @@
-from typing import Optional
-import litellm
-from litellm.files.main import ModelResponse
-from litellm import Choices, Message
-import os
-os.getenv("GEMINI_API_KEY")
-
-
-async def summarize(content: str, prompt: str) -> Optional[str]:
-    response = await litellm.acompletion(
-        # model="gemini/gemini-2.5-pro",
-        model="gemini/gemini-2.5-flash",
-        messages=[
-            {"role": "developer", "content": prompt},
-            {
-                "role": "user",
-                "content": f"以最简、高效、科学的方式总结以下内容：{content}",
-            },
-        ],
-        reasoning_effort="high",
-        temperature=0.6,
-    )
-    if isinstance(response, ModelResponse):
-        if isinstance(response.choices, list) and response.choices:
-            first_choice = response.choices[0]
-            if (
-                isinstance(first_choice, Choices)
-                and isinstance(first_choice.message, Message)
-                and isinstance(first_choice.message.content, str)
-            ):
-                result_str = first_choice.message.content
-                return result_str
+from typing import Optional
+import hashlib
+import asyncio
+import litellm
+from litellm.files.main import ModelResponse
+from litellm import Choices, Message
+import os
+from cache import read_cached, write_atomic
+os.getenv("GEMINI_API_KEY")
+
+SUMMARY_CACHE_DIR = ".cache/summaries"
+MODEL_NAME = "gemini/gemini-2.5-flash"
+LITE_MODEL_NAME = "gemini/gemini-2.5-flash-lite"
+# Subtitles shorter than this are summarized by the lite model with low reasoning effort
+SHORT_CONTENT_CHARS = 4000
+
+# Falls back to the full model when the lite model is rate limited or unavailable
+router = litellm.Router(
+    model_list=[
+        {"model_name": name, "litellm_params": {"model": name}}
+        for name in (LITE_MODEL_NAME, MODEL_NAME)
+    ],
+    fallbacks=[{LITE_MODEL_NAME: [MODEL_NAME]}],
+)
+
+
+def summary_cache_path(
+    content: str, prompt: str, model: str, reasoning_effort: str
+) -> str:
+    """根据 (prompt, 字幕, 模型, 推理强度) 的哈希计算缓存文件路径"""
+    h = hashlib.blake2b(digest_size=32)
+    for part in (prompt, content, model, reasoning_effort):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return os.path.join(SUMMARY_CACHE_DIR, f"{h.hexdigest()}.md")
+
+
+def route_model(content: str) -> tuple[str, str]:
+    """按字幕长度选择 (模型, 推理强度)：短内容使用更快、更便宜的配置"""
+    if len(content) < SHORT_CONTENT_CHARS:
+        return LITE_MODEL_NAME, "low"
+    return MODEL_NAME, "high"
+
+
+async def summarize(
+    content: str,
+    prompt: str,
+    model: Optional[str] = None,
+    reasoning_effort: Optional[str] = None,
+) -> Optional[str]:
+    routed_model, routed_effort = route_model(content)
+    model = model or routed_model
+    reasoning_effort = reasoning_effort or routed_effort
+
+    cache_path = summary_cache_path(content, prompt, model, reasoning_effort)
+    if (cached := await read_cached(cache_path)) is not None:
+        return cached
+
+    # Models outside the router (e.g. from --summary-model) are called directly
+    completion = (
+        router.acompletion
+        if model in (LITE_MODEL_NAME, MODEL_NAME)
+        else litellm.acompletion
+    )
+    response = await completion(
+        # model="gemini/gemini-2.5-pro",
+        model=model,
+        messages=[
+            {"role": "developer", "content": prompt},
+            {
+                "role": "user",
+                "content": f"以最简、高效、科学的方式总结以下内容：{content}",
+            },
+        ],
+        reasoning_effort=reasoning_effort,
+        temperature=0.6,
+    )
+    if isinstance(response, ModelResponse):
+        if isinstance(response.choices, list) and response.choices:
+            first_choice = response.choices[0]
+            if (
+                isinstance(first_choice, Choices)
+                and isinstance(first_choice.message, Message)
+                and isinstance(first_choice.message.content, str)
+            ):
+                result_str = first_choice.message.content
+                await asyncio.to_thread(write_atomic, cache_path, result_str)
+                return result_str